@@ -5,7 +5,15 @@ Created on Sat Jan  6 18:55:58 2024
 @author: Saman
 """
 
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
+import matplotlib
+
+# Use the non-interactive Agg backend as the figure is only saved to png
+matplotlib.use("Agg")
+
 import matplotlib.pyplot as plt
 
 import seaborn as sns
@@ -13,11 +21,27 @@ import matplotlib.ticker as ticker
 from matplotlib.gridspec import GridSpec
 
 
+# colors for the pie chart
+PIE_COLORS = ('#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+              '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
+              '#666699')
+
+# custom color palettes of the bar plots with two alternative colors,
+# desaturated like the seaborn bar plots
+BAR_PALETTE = sns.color_palette(["darkgoldenrod", "mediumseagreen"],
+                                desat=0.75)
+BAR2_PALETTE = sns.color_palette(["mediumorchid", "grey"], desat=0.75)
+
+# years from 1990 to 2022 are selected from the World Bank data
+START_YEAR = 1990
+END_YEAR = 2022
+
+
 def read_world_bank_data(filename):
     """
     Read the World Bank data with filename.
     Process the dataframe into world bank format.
-    Create two dataframes with years as index and countries as index.
+    Create a dataframe with countries as index.
 
     Parameters
     ----------
@@ -26,33 +50,104 @@ def read_world_bank_data(filename):
 
     Returns
     -------
-    df_year_index : Pandas.Dataframe
-        Dataframe with years as index.
     df_country_index : Pandas.Dataframe
         Dataframe with countries as index.
 
     """
 
-    # Read the World Bank data into the dataframe and skip 4 rows
-    df = pd.read_csv(filename, skiprows=4)
-
-    # years from 1990 to 2022 are selected
-    start_year = 1990
-    end_year = 2022
+    # years from START_YEAR to END_YEAR are selected
     all_cols_list = ["Country Name"] + \
-        [str(year) for year in range(start_year, end_year + 1)]
+        [str(year) for year in range(START_YEAR, END_YEAR + 1)]
+
+    # All year columns hold float values, so skip the type inference.
+    # float32 is precise enough for plotting and halves the memory
+    year_dtypes = {str(year): "float32"
+                   for year in range(START_YEAR, END_YEAR + 1)}
+
+    # Read only the selected columns of the World Bank data into the
+    # dataframe with the 5th row as header, using the multithreaded pyarrow
+    # parser when it is installed and the C parser otherwise.
+    # (header=4 is used instead of skiprows=4 as the pyarrow engine only
+    # honours skiprows without a header row)
+    try:
+        df = pd.read_csv(filename, header=4, usecols=all_cols_list,
+                         dtype=year_dtypes, engine="pyarrow")
+    except ImportError:
+        df = pd.read_csv(filename, header=4, usecols=all_cols_list,
+                         dtype=year_dtypes, engine="c", low_memory=False)
 
-    # Drop NA values
-    df.dropna(axis=1)
+    # Set "Country Name" as the index
+    df = df.set_index("Country Name")
 
-    # Select the years columns
-    df = df.loc[:, all_cols_list]
+    return df
 
-    # Set "Country Name" as the index
-    df.index = df["Country Name"]
-    df.drop("Country Name", axis=1, inplace=True)
 
-    return df.T, df
+def read_world_bank_table(indicator_files, filename="world_bank.parquet"):
+    """
+    Read the World Bank data of several indicators into one long-form
+    dataframe indexed by indicator, country and year.
+    The table is saved as Parquet on the first run and read from there
+    while it is newer than all csv files and was built from the same
+    indicators and years.
+
+    Parameters
+    ----------
+    indicator_files : dict
+        Mapping of indicator name to the filename of its csv.
+    filename : String
+        Filename of the Parquet table.
+
+    Returns
+    -------
+    df_long : Pandas.Dataframe
+        Dataframe with indicator, country and year as index and a single
+        "value" column.
+
+    """
+
+    # Years of the table, saved in the Parquet metadata through df.attrs
+    years = [START_YEAR, END_YEAR]
+
+    df = None
+    if os.path.exists(filename) and \
+            all(os.path.getmtime(filename) >= os.path.getmtime(csv_filename)
+                for csv_filename in indicator_files.values()):
+        df = pd.read_parquet(filename)
+
+        # Rebuild the table if it was saved for other indicators or years
+        if set(df["indicator"].cat.categories) != set(indicator_files) or \
+                df.attrs.get("years") != years:
+            df = None
+
+    if df is None:
+        # Parse the csv files in parallel threads
+        with ThreadPoolExecutor(len(indicator_files)) as executor:
+            frames = executor.map(read_world_bank_data,
+                                  indicator_files.values())
+
+        # Stack each dataframe into indicator, country, year and value
+        # columns, keeping the missing values so that every selected
+        # country and year can still be looked up
+        long_frames = []
+        for indicator, df in zip(indicator_files, frames):
+            df = df.rename_axis(index="country").reset_index() \
+                .melt(id_vars="country", var_name="year", value_name="value")
+            df.insert(0, "indicator", indicator)
+            long_frames.append(df)
+
+        df = pd.concat(long_frames, ignore_index=True)
+        df["indicator"] = df["indicator"].astype("category")
+        df["year"] = df["year"].astype("int16")
+        df.attrs["years"] = years
+
+        # Save the table so later runs skip the csv parser, unless no
+        # Parquet engine is installed
+        try:
+            df.to_parquet(filename, compression="zstd", index=False)
+        except ImportError:
+            pass
+
+    return df.set_index(["indicator", "country", "year"])
 
 
 def create_pie_chart(grid, df):
@@ -63,8 +158,8 @@ def create_pie_chart(grid, df):
     Parameters:
     - grid: GridSpec (matplotlib.gridspec.GridSpec) -
          Specifies the geometry of the grid that subplots are placed in.
-    - df: DataFrame - Contains population growth data
-        for various countries and years.
+    - df: Series - Contains population growth data
+        of the selected countries for the year 2022.
 
     Returns:
     None
@@ -73,23 +168,12 @@ def create_pie_chart(grid, df):
     # Define the subplot within the specified grid
     plt.subplot(grid[0, 2])
 
-    # List of countries to display in the pie chart
-    countries = ['Ireland', 'Australia', 'Singapore', 'Afghanistan',
-                 'Angola', 'South Africa', 'Canada', 'Bangladesh', 'Algeria',
-                 'Somalia', 'Nigeria']
-
-    # Filter the DataFrame for selected countries and round off values to
-    # 2 decimal places for the year 2022
-    df_filter = df.loc[countries, "2022"].round(2)
-
-    # choose colors for the pie chart
-    colors = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
-              '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
-              '#666699']
+    # Round off values to 2 decimal places
+    df_filter = df.round(2)
 
     # Plot the pie chart with colors, percentages and no labels
     wedges, texts, autotexts = plt.pie(df_filter, labels=None, autopct='%1.1f%%',
-                                       startangle=140, colors=colors,
+                                       startangle=140, colors=PIE_COLORS,
                                        pctdistance=0.58)
 
     # Draw a white circle in the center to create a donut chart
@@ -97,8 +181,8 @@ def create_pie_chart(grid, df):
     plt.gca().add_artist(center_circle)
 
     # Add legend with country names and corresponding population growth values
-    legend = plt.legend(wedges, [f'{country}: {population_growth}' for country,
-                                 population_growth in zip(countries, df_filter.values)],
+    legend = plt.legend(wedges, [f'{country}: {population_growth:g}' for country,
+                                 population_growth in df_filter.items()],
                         title='Countries (Values)', loc='center left',
                         bbox_to_anchor=(0.85, 0.5), frameon=False, fontsize=13)
 
@@ -123,7 +207,7 @@ def line_plot(grid, df, title, ylabel):
     grid : matplotlib.gridspec.GridSpec
         The grid specification for subplot placement.
     df : pandas.DataFrame
-        DataFrame for creating a line plot.
+        DataFrame with selected countries as index and years as columns.
     title : str
         Title of the line plot.
     ylabel : str
@@ -137,14 +221,14 @@ def line_plot(grid, df, title, ylabel):
     # Set subplot position based on the grid
     plt.subplot(grid[0, 0])
 
-    # Select specific countries for the line plot
-    country_list = ["Pakistan", "Germany", "South Africa", "Congo, Dem. Rep."]
+    # Convert the year columns to integers for the x-axis
+    years = df.columns.astype(int).to_numpy()
 
-    # Filter the DataFrame based on selected countries
-    df_filter = df.loc[:, country_list]
-
-    # Create a line plot using seaborn
-    ax = sns.lineplot(data=df_filter, linewidth=2.5, dashes=False)
+    # Create a line plot with one line per country (row)
+    ax = plt.gca()
+    for country, values in zip(df.index, df.to_numpy()):
+        ax.plot(years, values, linewidth=2.5, label=country,
+                rasterized=True)
 
     # Set the x-axis major locator to display ticks every 5 years
     ax.xaxis.set_major_locator(ticker.MultipleLocator(5))
@@ -171,8 +255,8 @@ def bar_plot(grid, df, title, ylabel):
 
     Parameters
     ----------
-    df : pandas.DataFrame
-        DataFrame for creating a bar plot.
+    df : pandas.Series
+        Unemployment rate of selected countries for year 2022.
     title : str
         Title of the bar plot.
     ylabel : str
@@ -186,30 +270,28 @@ def bar_plot(grid, df, title, ylabel):
     # Set subplot position based on the grid
     plt.subplot(grid[1, 0])
 
-    # Select countries with maximum rate of unemployment for the bar plot
-    country_list = ["South Africa", "Djibouti", "Eswatini",
-                    "Congo, Rep.", "Gabon", "Namibia", "Libya",
-                    "Botswana", "Somalia", "Sudan"]
-
-    # Filter the DataFrame based on selected countries and year 2022
-    df_filter = df.loc[country_list, "2022"].reset_index(name='Count')
+    # Get the countries and their values for the bar plot
+    country_list = df.index.tolist()
+    values = df.to_numpy()
 
-    # Define a custom color palette with two alternative colors
-    custom_palette = sns.color_palette(["darkgoldenrod", "mediumseagreen"])
+    # Create a horizontal bar plot, the colors cycle through the palette
+    ax = plt.gca()
+    ax.barh(country_list, values, color=BAR_PALETTE, rasterized=True)
 
-    # Create a bar plot using Seaborn
-    ax = sns.barplot(data=df_filter, y="Country Name", x="Count",
-                     palette=custom_palette)
+    # Show the first country at the top, with the same limits as a
+    # categorical axis
+    ax.set_ylim(len(country_list) - 0.5, -0.5)
 
-    # Calculate the total sum of counts
-    total = df_filter["Count"].sum()
+    # Calculate the percentage of each count relative to the total sum
+    # (Series.sum skips missing values, like the seaborn version did)
+    percentages = values / df.sum() * 100
+    labels = [f'{percentage:.1f}%' for percentage in percentages]
 
-    # Annotate each bar with its percentage relative to the total
-    for p in ax.patches:
-        percentage = '{:.1f}%'.format((p.get_width() / total) * 100)
-        x = p.get_x() + p.get_width() + 0.02
-        y = p.get_y() + p.get_height() / 2
-        ax.annotate(percentage, (x, y), ha='left', va='center')
+    # Annotate each bar with its percentage
+    for bar, label in zip(ax.patches, labels):
+        x = bar.get_width() + 0.02
+        y = bar.get_y() + bar.get_height() / 2
+        ax.annotate(label, (x, y), ha='left', va='center')
 
     # Remove x-axis title and labels and x ticks
     ax.set(xlabel='')
@@ -235,8 +317,9 @@ def bar_plot2(grid, df, title, xlabel):
 
     Parameters
     ----------
-    df : pandas.dataframe
-        create bar plot for dataframe df.
+    df : pandas.series
+        create bar plot for series df of the selected country with
+        years as index.
     title : string
         title of the bar plot.
     ylabel : string
@@ -251,17 +334,16 @@ def bar_plot2(grid, df, title, xlabel):
     # Set subplot position based on the grid
     plt.subplot(grid[0, 1])
 
-    # Select country Arab World
-    country_list = ["Arab World"]
+    # Get the years as integers and their values for the bar plot
+    years = df.index.astype(int).to_numpy()
+    values = df.to_numpy()
 
-    # filter the data for selected country from years 2000 to 2020
-    df_filter = df.loc[country_list, "2000":"2020"]
+    # Create a bar plot, the colors cycle through the palette
+    ax = plt.gca()
+    ax.bar(years, values, color=BAR2_PALETTE, rasterized=True)
 
-    # Define a custom color palette with two alternative colors
-    custom_palette = sns.color_palette(["mediumorchid", "grey"])
-
-    # Create a bar plot using Seaborn
-    ax = sns.barplot(data=df_filter, palette=custom_palette)
+    # Keep half a bar of space on both ends, as a categorical axis does
+    ax.set_xlim(years[0] - 0.5, years[-1] + 0.5)
 
     # Remove y-axis title and labels and y ticks
     ax.set(ylabel='')
@@ -342,40 +424,62 @@ def display_text():
     fig.suptitle('Effects of Population Growth', fontsize=26,
                  fontweight='bold', color='black')
 
+    # Tighten the layout of all subplots, leaving room for the main title
+    fig.tight_layout(rect=[0, 0, 1, 0.96])
+
     # Save the plot as png
-    plt.savefig("23010599.png", dpi=300)
+    plt.savefig("23010599.png", dpi=150)
 
 
-# read world bank data into two dataframes
-P_Years_df, P_countries_df = read_world_bank_data("Population_Growth.csv")
-M_Years_df, M_countries_df = read_world_bank_data("Net_Migration.csv")
-C_Years_df, C_countries_df = read_world_bank_data("CO2_Emission.csv")
-U_Years_df, U_countries_df = read_world_bank_data("Unemployment.csv")
+# read world bank data of all indicators into one long-form dataframe
+world_bank_df = read_world_bank_table({
+    "population_growth": "Population_Growth.csv",
+    "net_migration": "Net_Migration.csv",
+    "co2_emission": "CO2_Emission.csv",
+    "unemployment": "Unemployment.csv",
+})["value"]
+
+# Select the countries and years needed by each plot, so that only small
+# dataframes are handed to the plotting functions
+pie_countries = ['Ireland', 'Australia', 'Singapore', 'Afghanistan',
+                 'Angola', 'South Africa', 'Canada', 'Bangladesh', 'Algeria',
+                 'Somalia', 'Nigeria']
+line_countries = ["Pakistan", "Germany", "South Africa", "Congo, Dem. Rep."]
+bar_countries = ["South Africa", "Djibouti", "Eswatini",
+                 "Congo, Rep.", "Gabon", "Namibia", "Libya",
+                 "Botswana", "Somalia", "Sudan"]
+
+P_pie_df = world_bank_df.xs(("population_growth", 2022),
+                            level=("indicator", "year")).loc[pie_countries]
+M_line_df = world_bank_df.xs("net_migration", level="indicator") \
+    .unstack("year").loc[line_countries]
+U_bar_df = world_bank_df.xs(("unemployment", 2022),
+                            level=("indicator", "year")).loc[bar_countries]
+C_bar_df = world_bank_df.xs(("co2_emission", "Arab World"),
+                            level=("indicator", "country")).loc[2000:2020]
 
 
 # sns.set_theme()
 
 # create infographics figure
-fig = plt.figure(figsize=(18, 10), dpi=300)
-fig.tight_layout()
+fig = plt.figure(figsize=(18, 10), dpi=150)
 
 # select the grid size
 grid = GridSpec(2, 3, width_ratios=[1, 1, 1], height_ratios=[1, 1])
 
 # Call the function to create the pie chart of population growth
-create_pie_chart(grid, P_countries_df)
+create_pie_chart(grid, P_pie_df)
 
 # Call the function to create the line chart of net migration
-line_plot(grid, M_Years_df,
+line_plot(grid, M_line_df,
           "Decreased Net-Migration over years", "net migration")
 
 # Call the function to create the bar chart of Unemployment rate
-bar_plot(grid, U_countries_df,
+bar_plot(grid, U_bar_df,
          "Highest Unemployment rate: 2022", "countries")
 
 # Call the function to create the bar chart of CO2 emission
-bar_plot2(grid, C_countries_df, "CO2 Emission of 'Arab World'", "years")
+bar_plot2(grid, C_bar_df, "CO2 Emission of 'Arab World'", "years")
 
-# display the text and show the infographics
+# display the text and save the infographics
 display_text()
-plt.show()